@@ -1,6 +1,8 @@
 import numpy as np
 import os
+import functools
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 
 def analyze_output(a, m, output, detector, channel_groups):
@@ -13,6 +15,8 @@ def analyze_output(a, m, output, detector, channel_groups):
         nomix_tot file for time-integrated quantities \n
         Output: None"""
     channels = get_all_channels(channel_groups)
+    groups = ['Total'] + list(channel_groups)
+    offsets = get_group_offsets(channel_groups)
 
     time_filepath = os.path.join('./fluxes/', f'pinched_tab{a}_m{m}_key.dat')
     time = np.loadtxt(time_filepath, skiprows=1, usecols=[1], unpack=True)
@@ -25,32 +29,22 @@ def analyze_output(a, m, output, detector, channel_groups):
                                    detector=detector)
     n_bins = len(energy_bins)
 
-    time_totals = {'Total': np.zeros(n_time)}
-    time_avg = {'Total': np.zeros(n_time)}
+    channel_counts = load_time_counts(channels=channels,
+                                      n_time=n_time,
+                                      a=a,
+                                      m=m,
+                                      detector=detector,
+                                      n_bins=n_bins)
 
-    for group in channel_groups:
-        time_totals[group] = np.zeros(n_time)
-        time_avg[group] = np.zeros(n_time)
+    group_counts = get_group_counts(channel_counts, offsets=offsets)
 
-    for i in range(n_time):
-        channel_counts = load_channel_counts(channels=channels,
-                                             i=i+1,
-                                             a=a,
-                                             m=m,
-                                             detector=detector)
+    group_totals = get_totals(group_counts)
+    group_avg = get_avg(group_counts=group_counts,
+                        group_totals=group_totals,
+                        energy_bins=energy_bins)
 
-        group_counts = get_group_counts(channel_counts,
-                                        groups=channel_groups,
-                                        n_bins=n_bins)
-
-        group_totals = get_totals(group_counts)
-        group_avg = get_avg(group_counts=group_counts,
-                            group_totals=group_totals,
-                            energy_bins=energy_bins)
-
-        for group in group_totals:
-            time_totals[group][i] = group_totals[group]
-            time_avg[group][i] = group_avg[group]
+    time_totals = dict(zip(groups, group_totals.transpose()))
+    time_avg = dict(zip(groups, group_avg.transpose()))
 
     time_table = create_time_table(timesteps=time,
                                    time_totals=time_totals,
@@ -76,21 +70,74 @@ def get_all_channels(groups):
     return channels
 
 
-def load_channel_counts(channels, i, a, m, detector):
-    """Load all raw channel counts into dict
+def get_group_offsets(groups):
+    """Get index of the first channel of each group, as ordered by get_all_channels()
+    """
+    sizes = [len(subs) for subs in groups.values()]
+    return np.cumsum([0] + sizes[:-1])
+
+
+def load_time_counts(channels, n_time, a, m, detector, n_bins):
+    """Load raw channel counts for all timesteps
+
+    Parsed counts are cached to a binary .npz file, which is used instead
+    of the ascii files on later calls as long as none of them has changed
+    (by mtime or size) since it was written
+
+    Returns: [timesteps, channels, energy_bins]
     """
-    channel_counts = {}  # arrays of channel counts per energy bin
-    for chan in channels:
-        channel_counts[chan] = load_channel_dat(channel=chan, i=i, a=a,
-                                                m=m, detector=detector)
+    shape = (n_time, len(channels), n_bins)
+    cache_filepath = counts_cache_filepath(a=a, m=m, detector=detector)
+    dat_filepaths = [channel_dat_filepath(channel=chan, i=i+1, a=a, m=m, detector=detector)
+                     for i in range(n_time) for chan in channels]
+
+    stats = np.array([(st.st_mtime_ns, st.st_size) for st in map(os.stat, dat_filepaths)],
+                     dtype=np.int64)
+
+    if os.path.isfile(cache_filepath):
+        try:
+            with np.load(cache_filepath) as cache:
+                if ((list(cache['channels']) == channels)
+                        and (cache['counts'].shape == shape)
+                        and np.array_equal(cache['stats'], stats)):
+                    return cache['counts']
+        except Exception:
+            pass  # unreadable (e.g. truncated write), rebuild it
+
+    # float32 halves memory and cache size; sums are accumulated in float64
+    channel_counts = np.empty(shape, dtype=np.float32)
+
+    def load(i, chan):
+        return load_channel_dat(channel=chan, i=i+1, a=a, m=m,
+                                detector=detector, n_bins=n_bins)
+
+    # one pool for all files: the pandas (nrows) parser runs in C and
+    # releases the GIL, so threads overlap the reads across timesteps
+    i_list = [i for i in range(n_time) for chan in channels]
+    chan_list = [chan for i in range(n_time) for chan in channels]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        counts = executor.map(load, i_list, chan_list)
+
+        for k, chan_counts in enumerate(counts):
+            i, j = divmod(k, len(channels))
+            channel_counts[i, j] = chan_counts
+
+    # write to a temporary file first, so an interrupted save can't leave a truncated cache
+    tmp_filepath = f'{cache_filepath}.tmp'
+    with open(tmp_filepath, 'wb') as f:
+        np.savez(f, counts=channel_counts, channels=channels, stats=stats)
+    os.replace(tmp_filepath, cache_filepath)
+
     return channel_counts
 
 
-def load_channel_dat(channel, i, a, m, detector):
+def load_channel_dat(channel, i, a, m, detector, n_bins=None):
     """Load array of detection counts per energy bin
     """
     filepath = channel_dat_filepath(channel=channel, i=i, a=a, m=m, detector=detector)
-    return np.genfromtxt(filepath, skip_footer=2, usecols=[1], unpack=True)
+    energy_bins, counts = load_smeared(filepath, n_bins=n_bins)
+    return counts
 
 
 def channel_dat_filepath(channel, i, a, m, detector):
@@ -99,30 +146,77 @@ def channel_dat_filepath(channel, i, a, m, detector):
     return f'./out/pinched_tab{a}_m{m}_{i}_{channel}_{detector}_events_smeared.dat'
 
 
+def counts_cache_filepath(a, m, detector):
+    """Return filepath to binary cache of all channel counts
+    """
+    return f'./out/pinched_tab{a}_m{m}_{detector}_counts.npz'
+
+
 def load_energy_bins(channel, i, a, m, detector):
     """Load array of energy bins (MeV) from a snowglobes output file
     """
     filepath = channel_dat_filepath(channel=channel, i=i, a=a, m=m, detector=detector)
-    energy_bins = np.genfromtxt(filepath, skip_footer=2, usecols=[0], unpack=True)
+    energy_bins, counts = load_smeared(filepath)
     return energy_bins * 1000
 
 
+def load_smeared(filepath, n_bins=None):
+    """Load energy bins (GeV) and detection counts from a snowglobes output file
+
+    Returns: energy_bins, counts
+        read-only arrays, cached until the file is modified
+
+    Parameters
+    ----------
+    filepath : str
+    n_bins : int
+        no. of energy bins, if already known. Lets pandas' C parser stop
+        before the footer instead of reading the whole file first
+    """
+    return read_smeared(filepath, mtime=os.path.getmtime(filepath), n_bins=n_bins)
+
+
+@functools.lru_cache(maxsize=4096)
+def read_smeared(filepath, mtime, n_bins):
+    """Parse snowglobes output file, see load_smeared()
+
+    mtime is only used as part of the cache key
+    """
+    if n_bins is None:
+        with open(filepath, 'r') as f:
+            lines = f.readlines()[:-2]  # drop footer
+
+        data = np.loadtxt(lines, usecols=(0, 1), unpack=True)
+    else:
+        table = pd.read_csv(filepath, sep=r'\s+', header=None, usecols=[0, 1],
+                            nrows=n_bins, dtype=np.float64)
+        data = table.to_numpy().transpose()
+
+    data.setflags(write=False)
+    return data
+
+
 # ===========================================================
 #                   Group counts/averages
 # ===========================================================
-def get_group_counts(channel_counts, groups, n_bins):
+def get_group_counts(channel_counts, offsets):
     """Sum channel counts by group
-    """
-    group_counts = {'Total': np.zeros(n_bins)}
 
-    for group, sub_channels in groups.items():
-        counts = np.zeros(n_bins)
+    Returns: [timesteps, Total + groups, energy_bins]
 
-        for chan in sub_channels:
-            counts += channel_counts[chan]
+    Parameters
+    ----------
+    channel_counts : [timesteps, channels, energy_bins]
+    offsets : []
+        index of first channel in each group, see get_group_offsets()
+    """
+    shape = list(channel_counts.shape)
+    shape[-2] = len(offsets) + 1
+    group_counts = np.empty(shape)
 
-        group_counts['Total'] += counts
-        group_counts[group] = counts
+    np.add.reduceat(channel_counts, offsets, axis=-2, dtype=np.float64,
+                    out=group_counts[..., 1:, :])
+    np.sum(group_counts[..., 1:, :], axis=-2, out=group_counts[..., 0, :])
 
     return group_counts
 
@@ -130,25 +224,15 @@ def get_group_counts(channel_counts, groups, n_bins):
 def get_totals(group_counts):
     """Get total counts over all energy bins
     """
-    totals = {}
-    for group in group_counts:
-        totals[group] = np.sum(group_counts[group])
-
-    return totals
+    return group_counts.sum(axis=-1)
 
 
 def get_avg(group_counts, group_totals, energy_bins):
-    """Get group average energies
+    """Get group average energies (zero where there are no counts)
     """
-    group_avg = {}
-
-    for group, total in group_totals.items():
-        if total != 0:
-            avg = np.sum(group_counts[group] * energy_bins) / total
-        else:
-            avg = 0
-
-        group_avg[group] = avg
+    group_avg = np.zeros_like(group_totals)
+    np.divide(group_counts @ energy_bins, group_totals,
+              out=group_avg, where=(group_totals != 0))
 
     return group_avg
 
@@ -159,26 +243,20 @@ def get_avg(group_counts, group_totals, energy_bins):
 def create_time_table(timesteps, time_totals, time_avg):
     """Construct a DataFrame from time-dependent arrays of mean energies/total counts
     """
-    table = pd.DataFrame()
-    table['Time'] = timesteps
-
-    for group in time_avg:
-        table[f'Avg_{group}'] = time_avg[group]
+    columns = {'Time': timesteps}
+    columns.update({f'Avg_{group}': avg for group, avg in time_avg.items()})
+    columns.update({f'Tot_{group}': totals for group, totals in time_totals.items()})
 
-    for group in time_totals:
-        table[f'Tot_{group}'] = time_totals[group]
-
-    return table
+    return pd.DataFrame(columns)
 
 
 def save_time_table(table, detector, a, m, output):
     """Save time-dependent table to file
     """
     filepath = os.path.join(output, f"{detector}_analysis_tab{a}_m{m}.dat")
-    string = table.to_string(index=False, justify='left')
 
-    with open(filepath, 'w') as f:
-        f.write(string)
+    with open(filepath, 'w', buffering=1 << 20) as f:
+        table.to_csv(f, sep='\t', index=False, float_format='%.8g', lineterminator='\n')
 
 
 # ===========================================================
@@ -187,15 +265,8 @@ def save_time_table(table, detector, a, m, output):
 def write_to_integrated_file(m, integrated_avg, integrated_totals, integrated_file):
     """Write line to time-integrated dat file
     """
-    line = f'{m}\t'
-
-    for group, value in integrated_avg.items():
-        line += f'{value}\t'
-
-    for group, value in integrated_totals.items():
-        line += f'{value}\t'
-
-    line += '\n'
+    values = [*integrated_avg.values(), *integrated_totals.values()]
+    line = f'{m}\t' + '\t'.join(f'{value:.8g}' for value in values) + '\t\n'
 
     integrated_file.write(line)
 
@@ -215,19 +286,13 @@ def open_tot_file(tab, output, detector, channel_groups):
         name of detector, e.g. 'ar40kt'
     channel_groups : {}
     """
-    header = 'Mass\t'
-
-    header += 'Avg_Total\t'
-    for group in channel_groups:
-        header += f'Avg_{group}\t'
-
-    header += 'Tot_Total\t'
-    for group in channel_groups:
-        header += f'Tot_{group}\t'
+    groups = ['Total'] + list(channel_groups)
+    columns = ['Mass'] + [f'Avg_{group}' for group in groups] + [f'Tot_{group}' for group in groups]
+    header = '\t'.join(columns) + '\t\n'
 
-    header += '\n'
+    # rows are written one model at a time, so buffer them until close
     filepath = os.path.join(output, f'{detector}_analysis_tab{tab}.dat')
-    tot_file = open(filepath, "w")
+    tot_file = open(filepath, "w", buffering=1 << 20)
     tot_file.write(header)
 
     return tot_file
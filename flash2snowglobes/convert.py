@@ -1,6 +1,11 @@
+import math
 import numpy as np
 from scipy.special import gamma
-from scipy.integrate import trapz
+
+try:
+    import numba
+except ImportError:
+    numba = None
 
 """
 Note on docstrings:
@@ -33,60 +38,54 @@ def get_fluences(time, lum, avg, rms, dist, timebins, e_bins):
     """
     flavors = ['e', 'a', 'x']  # nu_e, nu_ebar, nu_x
 
-    n_timebins = len(timebins)
-    n_ebins = len(e_bins)
-
     dt = np.diff(timebins)[0]
     full_timebins = np.append(timebins, timebins[-1] + dt)
 
-    fluences = {f: np.zeros([n_timebins, n_ebins]) for f in flavors}
+    t_grid, y_grid = resample_timesteps(bin_edges=full_timebins,
+                                        time=time,
+                                        y_vars={'lum': lum, 'avg': avg, 'rms': rms})
 
-    for i in range(n_timebins):
-        bin_edges = full_timebins[[i, i+1]]
+    flux_spectrum = get_flux_spectrum(e_bins,
+                                      lum=y_grid['lum'],
+                                      avg=y_grid['avg'],
+                                      rms=y_grid['rms'],
+                                      dist=dist)
 
-        t_sliced, y_sliced = slice_timebin(bin_edges=bin_edges,
-                                           time=time,
-                                           y_vars={'lum': lum, 'avg': avg, 'rms': rms})
+    # trapezoid rule: sum segment areas within each time bin
+    dt_grid = np.diff(t_grid)[:, np.newaxis, np.newaxis]
+    segments = 0.5 * (flux_spectrum[:-1] + flux_spectrum[1:]) * dt_grid
 
-        flux_spectrum = get_flux_spectrum(e_bins,
-                                          lum=y_sliced['lum'],
-                                          avg=y_sliced['avg'],
-                                          rms=y_sliced['rms'],
-                                          dist=dist)
+    # t_grid ends on the last bin edge, so the final bin runs to the end
+    i_edges = np.searchsorted(t_grid, full_timebins)
+    fluence = np.add.reduceat(segments, i_edges[:-1], axis=0)
 
-        fluence = trapz(flux_spectrum, x=t_sliced, axis=0)
-
-        for j, flav in enumerate(flavors):
-            fluences[flav][i, :] = fluence[j, :]
+    fluences = {}
+    for j, flav in enumerate(flavors):
+        fluences[flav] = fluence[:, j, :]
 
     return fluences
 
 
-def slice_timebin(bin_edges, time, y_vars):
-    """Slice raw timesteps into a single timebin
+def resample_timesteps(bin_edges, time, y_vars):
+    """Resample raw timesteps onto a grid that includes all time bin edges
 
     Returns: time, y_vars
+        raw timesteps within the bin edges, merged with the bin edges
 
     Parameters
     ----------
-    bin_edges : [t_left, t_right]
+    bin_edges : [timebins + 1]
     time: [timesteps]
     y_vars: {var: [timesteps, flavors]}
     """
-    i_left, i_right = np.searchsorted(time, bin_edges)
-
-    t_sliced = np.array(time[i_left-1:i_right+1])
-    t_sliced[[0, -1]] = bin_edges  # replace endpoints with bin edges
+    inside = (time > bin_edges[0]) & (time < bin_edges[-1])
+    t_grid = np.union1d(time[inside], bin_edges)
 
-    y_sliced = {}
+    y_grid = {}
     for var, values in y_vars.items():
-        y_sliced[var] = np.array(values[i_left-1:i_right+1])
-
-        # replace endpoints with exact bin edges
-        y_edges = interpolate_time(t=bin_edges, time=time, y_var=values)
-        y_sliced[var][[0, -1]] = y_edges
+        y_grid[var] = interpolate_time(t=t_grid, time=time, y_var=values)
 
-    return t_sliced, y_sliced
+    return t_grid, y_grid
 
 
 def get_flux_spectrum(e_bins, lum, avg, rms, dist):
@@ -104,21 +103,68 @@ def get_flux_spectrum(e_bins, lum, avg, rms, dist):
     rms : [timesteps, flavors]
     dist : float
     """
-    n_ebins = len(e_bins)
-    n_time, n_flavors = lum.shape
     e_binsize = np.diff(e_bins)[0]
+    lum_to_flux = 1 / (4 * np.pi * dist**2)
+
+    if numba is not None:
+        return flux_kernel(e_bins, lum=lum, avg=avg, rms=rms,
+                           factor=lum_to_flux * e_binsize)
 
-    flux_spectrum = np.zeros([n_time, n_flavors, n_ebins])
     alpha = get_alpha(avg=avg, rms=rms)
-    lum_to_flux = 1 / (4 * np.pi * dist**2)
+    norm = get_phi_norm(avg=avg, alpha=alpha)
+
+    # broadcast to [timesteps, flavors, e_bins]
+    phi = get_phi(e_bin=e_bins,
+                  avg=avg[:, :, np.newaxis],
+                  alpha=alpha[:, :, np.newaxis],
+                  norm=norm[:, :, np.newaxis])
+
+    flux_spectrum = lum_to_flux * (lum / avg)[:, :, np.newaxis] * phi * e_binsize
+
+    return flux_spectrum
+
+
+def flux_kernel(e_bins, lum, avg, rms, factor):
+    """Calculate pinched flux spectrum in a single fused loop
+
+    Compiled with numba (if available) and used by get_flux_spectrum()
+
+    Returns: [timesteps, flavors, e_bins]
+
+    Parameters
+    ----------
+    e_bins : [e_bins]
+    lum : [timesteps, flavors]
+    avg : [timesteps, flavors]
+    rms : [timesteps, flavors]
+    factor : float
+        luminosity-to-flux conversion multiplied by energy bin size
+    """
+    n_ebins = len(e_bins)
+    n_time, n_flavors = lum.shape
+    flux_spectrum = np.empty((n_time, n_flavors, n_ebins))
+
+    for i_t in numba.prange(n_time):
+        for i_f in range(n_flavors):
+            e_avg = avg[i_t, i_f]
+            e_rms = rms[i_t, i_f]
+
+            alpha = (e_rms*e_rms - 2.0*e_avg*e_avg) / (e_avg*e_avg - e_rms*e_rms)
+            alpha_p1 = alpha + 1
+            norm = (factor * (lum[i_t, i_f] / e_avg)
+                    * alpha_p1**alpha_p1 / (e_avg * math.gamma(alpha_p1)))
 
-    for i, e_bin in enumerate(e_bins):
-        phi = get_phi(e_bin=e_bin, avg=avg, alpha=alpha)
-        flux_spectrum[:, :, i] = lum_to_flux * (lum / avg) * phi * e_binsize
+            for i_e in range(n_ebins):
+                ratio = e_bins[i_e] / e_avg
+                flux_spectrum[i_t, i_f, i_e] = norm * ratio**alpha * math.exp(-alpha_p1 * ratio)
 
     return flux_spectrum
 
 
+if numba is not None:
+    flux_kernel = numba.njit(parallel=True, cache=True)(flux_kernel)
+
+
 def interpolate_time(t, time, y_var):
     """Linearly-interpolate values at given time points
 
@@ -130,24 +176,28 @@ def interpolate_time(t, time, y_var):
         time points to interpolate to
     time : [timesteps]
         original time points
-    y_var : [timesteps]
+    y_var : [timesteps] or [timesteps, flavors]
         data values at original time points
     """
-    i_right = np.searchsorted(time, t)  # index of nearest point to the right
+    # index of nearest point to the right (clipped to extrapolate at the ends)
+    i_right = np.clip(np.searchsorted(time, t), 1, len(time) - 1)
     i_left = i_right - 1
 
-    y0 = y_var[i_left].transpose()
-    y1 = y_var[i_right].transpose()
+    y0 = y_var[i_left]
+    y1 = y_var[i_right]
 
-    t0 = time[i_left]
-    t1 = time[i_right]
+    # time points as a column, to broadcast over any flavor axis of y_var
+    shape = (-1,) + (1,) * (np.ndim(y_var) - 1)
+    t = np.reshape(t, shape)
+    t0 = time[i_left].reshape(shape)
+    t1 = time[i_right].reshape(shape)
 
     y_out = (y0*(t1 - t) + y1*(t - t0)) / (t1 - t0)
 
-    return y_out.transpose()
+    return y_out
 
 
-def get_phi(e_bin, avg, alpha):
+def get_phi(e_bin, avg, alpha, norm):
     """Calculate phi spectral parameter
 
     Returns : [timesteps]
@@ -155,19 +205,37 @@ def get_phi(e_bin, avg, alpha):
 
     Parameters
     ----------
-    e_bin : float
-        neutrino energy bin [GeV]
+    e_bin : float or [e_bins]
+        neutrino energy bin(s) [GeV], broadcast against avg and alpha
     avg : [timesteps]
         average neutrino energy [GeV]
     alpha : [timesteps]
         pinch parameter
+    norm : [timesteps]
+        normalisation of phi, see get_phi_norm()
     """
-    n = ((alpha + 1) ** (alpha + 1)) / (avg * gamma(alpha + 1))
-    phi = n * ((e_bin / avg)**alpha) * np.exp(-(alpha + 1) * e_bin / avg)
+    ratio = e_bin / avg
+    phi = norm * (ratio**alpha) * np.exp(-(alpha + 1) * ratio)
 
     return phi
 
 
+def get_phi_norm(avg, alpha):
+    """Calculate normalisation of phi, which is independent of energy bin
+
+    Returns : [timesteps]
+
+    Parameters
+    ----------
+    avg : [timesteps]
+        average neutrino energy [GeV]
+    alpha : [timesteps]
+        pinch parameter
+    """
+    alpha_p1 = alpha + 1
+    return (alpha_p1 ** alpha_p1) / (avg * gamma(alpha_p1))
+
+
 def get_bins(x0, x1, dx, endpoint):
     """Divide x into dx-spaced bins
 
@@ -1,6 +1,7 @@
 import numpy as np
-import pandas as pd
 import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 
 def write_fluence_files(tab, mass, timebins, e_bins, fluences_mixed):
@@ -8,6 +9,7 @@ def write_fluence_files(tab, mass, timebins, e_bins, fluences_mixed):
 
     Creates key file to indicate how file index is related to time
     Creates pinched file with fluences for every timestep
+    Skips writing if the files already exist for identical inputs
 
     Parameters
     ----------
@@ -24,66 +26,128 @@ def write_fluence_files(tab, mass, timebins, e_bins, fluences_mixed):
     """
     dt = np.diff(timebins)[0]
     path = './fluxes'
+    prefix = f'{path}/pinched_tab{tab}_m{mass}'
+    n_timebins = len(timebins)
 
-    # write key table
-    key_table = get_key_table(timebins=timebins, dt=dt)
-    key_filepath = os.path.join(path, f'pinched_tab{tab}_m{mass}_key.dat')
+    # skip if files were already written from identical inputs
+    hash_filepath = f'{prefix}.hash'
+    input_hash = get_input_hash(timebins=timebins,
+                                e_bins=e_bins,
+                                fluences_mixed=fluences_mixed)
+
+    filepaths = [f'{prefix}_key.dat'] + [f'{prefix}_{i+1}.dat' for i in range(n_timebins)]
 
-    with open(key_filepath, 'w') as keyfile:
-        key_table.to_string(keyfile, index=False)
+    if os.path.isfile(hash_filepath) and all(os.path.isfile(f) for f in filepaths):
+        with open(hash_filepath, 'r') as f:
+            if f.read() == input_hash:
+                return
 
-    # write fluence files
-    for i in range(len(timebins)):
-        out_filepath = os.path.join(path, f'pinched_tab{tab}_m{mass}_{i+1}.dat')
-        table = format_fluence_table(time_i=i,
-                                     e_bins=e_bins,
-                                     fluences_mixed=fluences_mixed)
+    # invalidate first, so an interrupted rewrite is never mistaken for complete
+    if os.path.isfile(hash_filepath):
+        os.remove(hash_filepath)
 
-        with open(out_filepath, 'w') as outfile:
-            table.to_string(outfile, header=None, index=False)
+    # write key table
+    key_table = np.column_stack([np.arange(1, n_timebins + 1),
+                                 timebins,
+                                 np.full(n_timebins, dt)])
+    key_filepath = f'{prefix}_key.dat'
+
+    with open(key_filepath, 'w', buffering=1 << 20) as keyfile:
+        np.savetxt(keyfile, key_table,
+                   fmt=['%d', '%.6e', '%.6e'],
+                   header='i time[s] dt[s]',
+                   comments='')
+
+    # look up flavors once, rather than for every timebin
+    e_all = fluences_mixed['e']
+    x_all = fluences_mixed['x']
+    a_all = fluences_mixed['a']
+    ax_all = fluences_mixed['ax']
+
+    # write fluence files, each to a distinct file so threads can overlap I/O
+    def write(i):
+        write_fluence_file(time_i=i,
+                           prefix=prefix,
+                           e_bins=e_bins,
+                           e_all=e_all,
+                           x_all=x_all,
+                           a_all=a_all,
+                           ax_all=ax_all)
+
+    max_workers = min(32, 4 * (os.cpu_count() or 1))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(write, range(n_timebins)))
+
+    tmp_filepath = f'{hash_filepath}.tmp'
+    with open(tmp_filepath, 'w') as f:
+        f.write(input_hash)
+    os.replace(tmp_filepath, hash_filepath)
+
+
+def get_input_hash(timebins, e_bins, fluences_mixed):
+    """Return hash of the inputs used to write fluence files
+
+    Returns : str
 
+    Parameters
+    ----------
+    timebins : []
+    e_bins : []
+    fluences_mixed : {flavor: [timebins, e_bins]}
+    """
+    h = hashlib.blake2b()
+    h.update(np.ascontiguousarray(timebins).tobytes())
+    h.update(np.ascontiguousarray(e_bins).tobytes())
 
-def get_key_table(timebins, dt):
-    """Return key table
+    for key in sorted(fluences_mixed):
+        h.update(key.encode())
+        h.update(np.ascontiguousarray(fluences_mixed[key]).tobytes())
 
-    Returns : pd.DataFrame
+    return h.hexdigest()
+
+
+def write_fluence_file(time_i, prefix, e_bins, e_all, x_all, a_all, ax_all):
+    """Write snowglobes input file for a single timestep
 
     Parameters
     ----------
-    timebins : []
-    dt : float
+    time_i : int
+        timestep index
+    prefix : str
+        filepath up to the timestep number, e.g. './fluxes/pinched_tab1_m9.0'
+    e_bins : []
+    e_all, x_all, a_all, ax_all : [timebins, e_bins]
+        mixed fluences of each flavor
     """
-    table = pd.DataFrame()
-    table['i'] = np.arange(len(timebins)) + 1
-    table['time[s]'] = timebins
-    table['dt[s]'] = dt
+    out_filepath = f'{prefix}_{time_i+1}.dat'
+    table = format_fluence_table(time_i=time_i,
+                                 e_bins=e_bins,
+                                 e_all=e_all,
+                                 x_all=x_all,
+                                 a_all=a_all,
+                                 ax_all=ax_all)
 
-    return table
+    # buffer the whole file so it goes out in a single write
+    with open(out_filepath, 'w', buffering=1 << 20) as outfile:
+        np.savetxt(outfile, table, fmt='%.6e')
 
 
-def format_fluence_table(time_i, e_bins, fluences_mixed):
+def format_fluence_table(time_i, e_bins, e_all, x_all, a_all, ax_all):
     """Return fluence table for given timestep
 
-    Returns: pd.DataFrame
+    Returns: [e_bins, 7]
+        columns: E_nu, e, mu, tau, ebar, mubar, taubar
 
     Parameters
     ----------
     time_i : int
         timestep index
     e_bins : []
-    fluences_mixed : {flavor: [timebins, e_bins]}
+    e_all, x_all, a_all, ax_all : [timebins, e_bins]
+        mixed fluences of each flavor
     """
-    flavor_map = {'e': 'e',
-                  'mu': 'x',
-                  'tau': 'x',
-                  'ebar': 'a',
-                  'mubar': 'ax',
-                  'taubar': 'ax',
-                  }
-    table = pd.DataFrame()
-    table['E_nu'] = e_bins
-
-    for flavor, key in flavor_map.items():
-        table[flavor] = fluences_mixed[key][time_i]
-
-    return table
+    x_row = x_all[time_i]
+    ax_row = ax_all[time_i]
+
+    return np.column_stack([e_bins, e_all[time_i], x_row, x_row,
+                            a_all[time_i], ax_row, ax_row])
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 # snowglobes
 from . import config
@@ -32,6 +31,7 @@ def setup_subplots(n_sub,
     n_cols = {False: 1, True: max_cols}.get(n_sub > 1)
     figsize = (n_cols * sub_figsize[0], n_rows * sub_figsize[1])
 
+    import matplotlib.pyplot as plt
     return plt.subplots(n_rows, n_cols, figsize=figsize, **kwargs)
 
 
@@ -46,6 +46,7 @@ def check_ax(ax, figsize):
     fig = None
 
     if ax is None:
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots(figsize=figsize)
 
     return fig, ax
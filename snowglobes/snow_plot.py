@@ -1,5 +1,3 @@
-import matplotlib.pyplot as plt
-
 # snowglobes
 from . import plot_tools
 from . import config
@@ -104,6 +102,8 @@ def plot_channels(summary, y_var, prog_table, channels,
     label : str
     data_only : bool
     """
+    import matplotlib.pyplot as plt
+
     fig = None
     if axes is None:
         fig, axes = plt.subplots(len(channels), figsize=figsize, sharex=True)
@@ -312,6 +312,7 @@ def setup_fig_ax(ax, figsize):
     fig = None
 
     if ax is None:
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots(figsize=figsize)
 
     return fig, ax
@@ -1,16 +1,84 @@
 import os
+import glob
+import pickle
+import hashlib
+import inspect
+import functools
 import numpy as np
 import pandas as pd
 import xarray as xr
+from concurrent.futures import ThreadPoolExecutor
 
 """
 Tools for handling snowglobes data
 """
 
+# Increment whenever the output of a cached loader changes
+# (including the readers it calls), to invalidate old cached tables
+CACHE_VERSION = 2
+
+
+# ===============================================================
+#                      Caching
+# ===============================================================
+def disk_cache(get_filepaths):
+    """Decorator to cache the output of a table loader on disk
+
+    Cached tables are keyed on CACHE_VERSION and the path, mtime and size
+    of every source file, so any replaced file invalidates the cache
+
+    parameters
+    ----------
+    get_filepaths : function
+        takes the loader's arguments, returns list of source filepaths
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            filepaths = get_filepaths(**bound.arguments)
+
+            # loader_key identifies the call, and is used to clear superseded entries
+            loader_str = repr((CACHE_VERSION, func.__name__, filepaths))
+            loader_key = hashlib.md5(loader_str.encode()).hexdigest()
+
+            stats = [(f, st.st_mtime_ns, st.st_size)
+                     for f, st in zip(filepaths, map(os.stat, filepaths))]
+            key = hashlib.md5(repr((loader_str, stats)).encode()).hexdigest()
+            cache_filepath = os.path.join(cache_path(), f'{loader_key}_{key}.pickle')
+
+            if os.path.isfile(cache_filepath):
+                try:
+                    with open(cache_filepath, 'rb') as f:
+                        return pickle.load(f)
+                except Exception:
+                    pass  # unreadable (e.g. other pandas version), rebuild it
+
+            table = func(*args, **kwargs)
+
+            os.makedirs(cache_path(), exist_ok=True)
+            for stale in glob.glob(os.path.join(cache_path(), f'{loader_key}_*.pickle')):
+                os.remove(stale)
+
+            tmp_filepath = f'{cache_filepath}.tmp'
+            with open(tmp_filepath, 'wb') as f:
+                pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_filepath, cache_filepath)
+
+            return table
+
+        return wrapper
+    return decorator
+
 
 # ===============================================================
 #                      Load Tables
 # ===============================================================
+@disk_cache(lambda tab, detector, time_integral:
+            [summary_table_filepath(tab=tab, detector=detector, time_integral=time_integral)])
 def load_summary_table(tab, detector, time_integral=30):
     """Load time-integrated summary table containing all mass models
 
@@ -23,12 +91,13 @@ def load_summary_table(tab, detector, time_integral=30):
     time_integral : int
         time integrated over post-bounce (milliseconds)
     """
-    path = data_path()
-    filename = f'{detector}_analysis_{time_integral}ms_a{tab}.dat'
-    filepath = os.path.join(path, filename)
-    return pd.read_csv(filepath, delim_whitespace=True)
+    filepath = summary_table_filepath(tab=tab, detector=detector, time_integral=time_integral)
+    return read_table(filepath)
 
 
+@disk_cache(lambda mass_list, tab, detector, output_dir:
+            [mass_table_filepath(mass=mass, tab=tab, detector=detector, output_dir=output_dir)
+             for mass in mass_list])
 def load_all_mass_tables(mass_list, tab, detector,
                          output_dir='mass_tables'):
     """Load and combine tables for all mass models
@@ -43,21 +112,32 @@ def load_all_mass_tables(mass_list, tab, detector,
     detector : str
     output_dir : str
     """
-    tables_dict = {}
-    for j, mass in enumerate(mass_list):
-        print(f'\rLoading mass tables: {j+1}/{len(mass_list)}', end='')
+    def load(mass):
+        return load_mass_table(mass=mass,
+                               tab=tab,
+                               detector=detector,
+                               output_dir=output_dir)
+
+    n_mass = len(mass_list)
+    data = None
+
+    # file reads release the GIL, so threads overlap I/O across masses
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tables = executor.map(load, mass_list)
 
-        table = load_mass_table(mass=mass,
-                                tab=tab,
-                                detector=detector,
-                                output_dir=output_dir)
+        for j, table in enumerate(tables):
+            print(f'\rLoading mass tables: {j+1}/{n_mass}', end='')
 
-        table.set_index('Time', inplace=True)
-        tables_dict[mass] = table.to_xarray()
+            if data is None:
+                time = table['Time'].to_numpy()
+                columns = table.columns.drop('Time')
+                data = np.empty([n_mass, len(time), len(columns)])
+
+            data[j] = table[columns].to_numpy()
 
     print()
-    mass_tables = xr.concat(tables_dict.values(), dim='mass')
-    mass_tables.coords['mass'] = list(mass_list)
+    data_vars = {col: (('mass', 'Time'), data[:, :, k]) for k, col in enumerate(columns)}
+    mass_tables = xr.Dataset(data_vars, coords={'mass': list(mass_list), 'Time': time})
 
     return mass_tables
 
@@ -75,19 +155,31 @@ def load_mass_table(mass, tab, detector,
     detector : str
     output_dir : str
     """
-    path = data_path()
-    filename = f'{detector}_analysis_tab{tab}_m{mass}.dat'
-    filepath = os.path.join(path, output_dir, filename)
-    return pd.read_csv(filepath, delim_whitespace=True)
+    filepath = mass_table_filepath(mass=mass, tab=tab, detector=detector, output_dir=output_dir)
+    return read_table(filepath)
 
 
+@disk_cache(lambda: [prog_path()])
 def load_prog_table():
     """Load progenitor data table
 
     Returns : pd.DataFrame
+        indexed by mass
     """
     filepath = prog_path()
-    return pd.read_csv(filepath, delim_whitespace=True)
+    return read_table(filepath).set_index('mass')
+
+
+def read_table(filepath):
+    """Read whitespace-delimited table
+
+    Returns : pd.DataFrame
+
+    parameters
+    ----------
+    filepath : str
+    """
+    return pd.read_csv(filepath, sep=r'\s+', engine='c')
 
 
 # ===============================================================
@@ -109,25 +201,41 @@ def time_integrate(mass_tables, n_bins, channels):
         list of channel names
     """
     channels = ['Total'] + channels
-    mass_arrays = {}
 
-    time_slice = mass_tables.isel(Time=slice(0, n_bins))
-    totals = time_slice.sum(dim='Time')
-    table = xr.Dataset()
+    # dim: [mass, Time, channel]
+    counts = stack_channels(mass_tables, y_var='Tot', channels=channels)
+    avgs = stack_channels(mass_tables, y_var='Avg', channels=channels)
+    counts = counts.transpose('mass', 'Time', 'channel').values
+    avgs = avgs.transpose('mass', 'Time', 'channel').values
 
-    for channel in channels:
-        tot = f'Tot_{channel}'
-        avg = f'Avg_{channel}'
+    total_counts = sum_bins(counts, n_bins=n_bins)
+    total_energy = sum_bins(avgs * counts, n_bins=n_bins)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_avg = total_energy / total_counts
 
-        total_counts = totals[tot]
-        total_energy = (time_slice[avg] * time_slice[tot]).sum(dim='Time')
+    table = xr.Dataset(coords={'mass': mass_tables['mass'].values})
 
-        table[tot] = total_counts
-        table[avg] = total_energy / total_counts
+    for i, channel in enumerate(channels):
+        table[f'Tot_{channel}'] = ('mass', total_counts[:, i])
+        table[f'Avg_{channel}'] = ('mass', total_avg[:, i])
 
     return table
 
 
+def sum_bins(arr, n_bins):
+    """Sum over the first n_bins time bins, ignoring NaNs
+
+    Returns : [mass, channel]
+
+    parameters
+    ----------
+    arr : [mass, Time, channel]
+    n_bins : int
+    """
+    return np.nansum(arr[:, :n_bins], axis=1)
+
+
 def get_cumulative(mass_tables, max_n_bins, channels):
     """Calculate cumulative neutrino counts for each time bin
 
@@ -143,18 +251,44 @@ def get_cumulative(mass_tables, max_n_bins, channels):
     channels : [str]
         list of channel names
     """
-    bins = np.arange(1, max_n_bins+1)
-    cumulative = {}
+    channels = ['Total'] + channels
+    time_slice = mass_tables.isel(Time=slice(0, max_n_bins))
 
-    for b in bins:
-        print(f'\rIntegrating bins: {b}/{max_n_bins}', end='')
-        cumulative[b] = time_integrate(mass_tables, n_bins=b, channels=channels)
+    # stack channels, dim: [channel, mass, Time]
+    counts = stack_channels(time_slice, y_var='Tot', channels=channels)
+    avgs = stack_channels(time_slice, y_var='Avg', channels=channels)
 
-    print()
-    x = xr.concat(cumulative.values(), dim='n_bins')
-    x.coords['n_bins'] = bins
+    # running sums give the integral up to every bin in a single pass
+    total_counts = counts.cumsum(dim='Time')
+    total_energy = (avgs * counts).cumsum(dim='Time')
+    total_avg = total_energy / total_counts
+
+    cumulative = xr.Dataset()
+    for channel in channels:
+        cumulative[f'Tot_{channel}'] = total_counts.sel(channel=channel, drop=True)
+        cumulative[f'Avg_{channel}'] = total_avg.sel(channel=channel, drop=True)
+
+    bins = np.arange(1, cumulative.sizes['Time'] + 1)
+    cumulative = cumulative.rename({'Time': 'n_bins'}).assign_coords(n_bins=bins)
+
+    return cumulative.transpose('n_bins', 'mass')
+
+
+def stack_channels(table, y_var, channels):
+    """Stack channel columns of a table along a new 'channel' dimension
+
+    Returns : xr.DataArray
+
+    parameters
+    ----------
+    table : xr.Dataset
+    y_var : 'Tot' or 'Avg'
+    channels : [str]
+    """
+    columns = [y_column(y_var=y_var, channel=channel) for channel in channels]
+    stacked = table[columns].to_array(dim='channel')
 
-    return x
+    return stacked.assign_coords(channel=channels)
 
 
 def get_channel_fractions(tables, channels):
@@ -164,21 +298,30 @@ def get_channel_fractions(tables, channels):
 
     Parameters
     ----------
-    tables : {model_set: pd.DataFrame}
+    tables : {model_set: pd.DataFrame or xr.Dataset}
     channels : [str]
     """
-    n_channels = len(channels)
-    frac_table = pd.DataFrame()
+    stacked = []
+    for table in tables.values():
+        if isinstance(table, pd.DataFrame):
+            table = xr.Dataset.from_dataframe(table)
 
-    for model_set, table in tables.items():
-        fracs = np.zeros(n_channels)
+        stacked += [stack_channels(table, y_var='Tot', channels=['Total'] + channels)]
 
-        for i, channel in enumerate(channels):
-            fracs[i] = np.mean(table[f'Tot_{channel}'] / table['Tot_Total'])
+    # dim: [model_set, channel, mass]
+    # model sets may cover different masses/rows; the padded NaNs are skipped by mean()
+    counts = xr.concat(stacked, dim='model_set', join='outer').assign_coords(model_set=list(tables))
 
-        frac_table[model_set] = fracs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fracs = counts.sel(channel=channels) / counts.sel(channel='Total', drop=True)
+
+    model_dims = [dim for dim in fracs.dims if dim not in ('model_set', 'channel')]
+    fracs = fracs.mean(dim=model_dims)
+
+    frac_table = fracs.transpose('channel', 'model_set').to_pandas()
+    frac_table.index.name = None
+    frac_table.columns.name = None
 
-    frac_table.index = channels
     return frac_table
 
 
@@ -208,6 +351,32 @@ def data_path():
     return os.path.join(path, 'plotRoutines', 'SnowglobesData')
 
 
+def summary_table_filepath(tab, detector, time_integral):
+    """Return path to time-integrated summary table
+
+    Returns : str
+    """
+    filename = f'{detector}_analysis_{time_integral}ms_a{tab}.dat'
+    return os.path.join(data_path(), filename)
+
+
+def mass_table_filepath(mass, tab, detector, output_dir):
+    """Return path to time-binned table of an individual mass model
+
+    Returns : str
+    """
+    filename = f'{detector}_analysis_tab{tab}_m{mass}.dat'
+    return os.path.join(data_path(), output_dir, filename)
+
+
+def cache_path():
+    """Return path to directory of cached tables
+
+    Returns : str
+    """
+    return os.path.join(os.path.expanduser('~'), '.cache', 'flash_snowglobes')
+
+
 def prog_path():
     """Return path to progenitor table
 
@@ -217,6 +386,7 @@ def prog_path():
     return os.path.join(path, 'plotRoutines', 'data', 'progenitor_table.dat')
 
 
+@functools.lru_cache(maxsize=256)
 def y_column(y_var, channel):
     """Return name of column
 
@@ -1,5 +1,5 @@
+import functools
 import numpy as np
-import matplotlib.pyplot as plt
 
 # snowglobes
 from . import snow_tools
@@ -32,7 +32,8 @@ class SnowGlobesData:
         mass_list : [float]
             progenitor ZAMS masses of models
         load_data : bool
-            immediately load all data
+            immediately load all data. Otherwise, tables are loaded
+            on first access
         output_dir : str
             name of directory containing snowglobes data
         n_bins : int
@@ -46,16 +47,14 @@ class SnowGlobesData:
         self.channels = config.channels[detector]
         self.mass_list = mass_list
 
-        self.summary_tables = None
-        self.mass_tables = None
-        self.prog_table = None
-        self.channel_fracs = None
         self.cumulative = None
+        self.integrated = {}
 
         if self.mass_list is None:
             self.mass_list = config.mass_list
 
         self.n_mass = len(self.mass_list)
+        self.colors = {model_set: config.colors.get(model_set) for model_set in self.model_sets}
 
         if load_data:
             self.load_mass_tables()
@@ -63,6 +62,37 @@ class SnowGlobesData:
             self.load_prog_table()
             self.get_channel_fractions()
 
+    # ===============================================================
+    #                      Lazy Tables
+    # ===============================================================
+    @functools.cached_property
+    def mass_tables(self):
+        """Time-dependent tables for all individual mass models
+        """
+        self.load_mass_tables()
+        return self.mass_tables
+
+    @functools.cached_property
+    def summary_tables(self):
+        """Time-integrated tables for all model sets
+        """
+        self.integrate_summary()
+        return self.summary_tables
+
+    @functools.cached_property
+    def prog_table(self):
+        """Progenitor table of the mass models
+        """
+        self.load_prog_table()
+        return self.prog_table
+
+    @functools.cached_property
+    def channel_fracs(self):
+        """Fractional contribution of each channel to total counts
+        """
+        self.get_channel_fractions()
+        return self.channel_fracs
+
     # ===============================================================
     #                      Load Tables
     # ===============================================================
@@ -70,34 +100,26 @@ class SnowGlobesData:
         """Load all time-integrated summary tables
         """
         print('Loading summary tables')
-        tables = dict.fromkeys(self.model_sets)
-
-        for i, tab in enumerate(self.tabs):
-            model_set = self.model_sets[i]
-            tables[model_set] = snow_tools.load_summary_table(tab=tab,
-                                                              detector=self.detector)
-        self.summary_tables = tables
+        self.summary_tables = {model_set: snow_tools.load_summary_table(tab=tab,
+                                                                        detector=self.detector)
+                               for model_set, tab in zip(self.model_sets, self.tabs)}
 
     def load_mass_tables(self):
         """Load time-dependent tables for all individual mass models
         """
-        tables = dict.fromkeys(self.model_sets)
-
-        for i, tab in enumerate(self.tabs):
-            model_set = self.model_sets[i]
-            print(f'Loading {model_set}')
-            tables[model_set] = snow_tools.load_all_mass_tables(
-                mass_list=self.mass_list,
-                tab=tab,
-                detector=self.detector,
-                output_dir=self.output_dir)
-        self.mass_tables = tables
+        print(f'Loading mass tables: {", ".join(self.model_sets)}')
+        self.mass_tables = {model_set: snow_tools.load_all_mass_tables(
+                                mass_list=self.mass_list,
+                                tab=tab,
+                                detector=self.detector,
+                                output_dir=self.output_dir)
+                            for model_set, tab in zip(self.model_sets, self.tabs)}
 
     def load_prog_table(self):
         """Load progenitor table
         """
         prog_table = snow_tools.load_prog_table()
-        self.prog_table = prog_table[prog_table['mass'].isin(self.mass_list)]
+        self.prog_table = prog_table.loc[list(self.mass_list)].reset_index()
 
     # ===============================================================
     #                      Analysis
@@ -110,15 +132,34 @@ class SnowGlobesData:
 
         self.print_time_slice(n_bins=n_bins)
 
-        tables = {}
-        for model_set in self.model_sets:
-            print(f'Integrating: {model_set}')
-            mass_tables = self.mass_tables[model_set]
-            tables[model_set] = snow_tools.time_integrate(mass_tables=mass_tables,
-                                                          n_bins=n_bins,
-                                                          channels=self.channels)
+        self.summary_tables = {model_set: self.integrate_model_set(model_set=model_set,
+                                                                   n_bins=n_bins)
+                               for model_set in self.model_sets}
         print()
-        self.summary_tables = tables
+
+    def integrate_model_set(self, model_set, n_bins):
+        """Integrate a single model set over timebins
+
+        Results are memoized on (model_set, n_bins), and recomputed
+        if the mass tables of the model_set have been reloaded
+
+        parameters
+        ----------
+        model_set : str
+        n_bins : int
+        """
+        mass_tables = self.mass_tables[model_set]
+        cached = self.integrated.get((model_set, n_bins))
+
+        if (cached is None) or (cached[0] is not mass_tables):
+            print(f'Integrating: {model_set}')
+            table = snow_tools.time_integrate(mass_tables=mass_tables,
+                                              n_bins=n_bins,
+                                              channels=self.channels)
+            cached = (mass_tables, table)
+            self.integrated[(model_set, n_bins)] = cached
+
+        return cached[1]
 
     def get_cumulative(self, max_n_bins=None):
         """Integrate models over timebins
@@ -127,16 +168,13 @@ class SnowGlobesData:
             max_n_bins = self.n_bins
 
         self.print_time_slice(n_bins=max_n_bins - 1)
-        tables = {}
 
-        for model_set in self.model_sets:
-            print(f'Integrating: {model_set}')
-            mass_tables = self.mass_tables[model_set]
-            tables[model_set] = snow_tools.get_cumulative(mass_tables=mass_tables,
-                                                          max_n_bins=max_n_bins,
-                                                          channels=self.channels)
+        print(f'Integrating cumulative: {", ".join(self.model_sets)}')
+        self.cumulative = {model_set: snow_tools.get_cumulative(mass_tables=mass_tables,
+                                                                max_n_bins=max_n_bins,
+                                                                channels=self.channels)
+                           for model_set, mass_tables in self.mass_tables.items()}
         print()
-        self.cumulative = tables
 
     def get_channel_fractions(self):
         """Calculate fractional contribution of each channel to total counts
@@ -189,7 +227,7 @@ class SnowGlobesData:
                                    marker=marker,
                                    ax=ax,
                                    label=model_set,
-                                   color=config.colors.get(model_set),
+                                   color=self.colors.get(model_set),
                                    data_only=True)
 
         if not data_only:
@@ -241,6 +279,7 @@ class SnowGlobesData:
 
         fig = None
         if axes is None:
+            import matplotlib.pyplot as plt
             fig, axes = plt.subplots(len(channels), figsize=figsize, sharex=True)
 
         for model_set, summary in self.summary_tables.items():
@@ -252,7 +291,7 @@ class SnowGlobesData:
                                     marker=marker,
                                     figsize=figsize,
                                     label=model_set,
-                                    color=config.colors.get(model_set),
+                                    color=self.colors.get(model_set),
                                     legend=False,
                                     axes=axes,
                                     data_only=True)
@@ -345,7 +384,7 @@ class SnowGlobesData:
                                 y_var=y_var,
                                 mass=mass,
                                 label=model_set,
-                                color=config.colors.get(model_set),
+                                color=self.colors.get(model_set),
                                 channel=channel,
                                 ax=ax,
                                 data_only=True)
@@ -398,7 +437,7 @@ class SnowGlobesData:
                                       y_scale=y_scale,
                                       ax=ax,
                                       label=model_set,
-                                      color=config.colors.get(model_set),
+                                      color=self.colors.get(model_set),
                                       linestyle=linestyle,
                                       data_only=True)
 
@@ -449,8 +488,9 @@ class SnowGlobesData:
         def update_slider(n_bins):
             n_bins = int(n_bins)
 
-            for i, model_set in enumerate(self.model_sets):
-                data = self.cumulative[model_set].sel(n_bins=n_bins)
+            for model_set, cumulative in self.cumulative.items():
+                # n_bins coords are 1..N, so index by position directly
+                data = cumulative.isel(n_bins=n_bins - 1)
 
                 slider.update_ax_y(y=data[y_col],
                                    y_var=y_col,